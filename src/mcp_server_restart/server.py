@@ -1,16 +1,20 @@
 import os
-import json
 import logging
-import psutil
 import subprocess
-from typing import Any, Optional
+from typing import TYPE_CHECKING, Any, Optional
 import sys
 import asyncio
+import select
+import time
 from mcp.server.models import InitializationOptions
 from mcp.server import Server, NotificationOptions
 import mcp.types as types
 import mcp.server.stdio
-from datetime import datetime
+
+# psutil and orjson load C extensions on import, which adds noticeably to
+# the stdio startup path; they are imported on first use below
+if TYPE_CHECKING:
+    import psutil
 
 # Configure logging
 logger = logging.getLogger(__name__)
@@ -23,21 +27,303 @@ logger.setLevel(logging.DEBUG)
 # Create a server instance
 server = Server("claude-restart-server")
 
+# Process name of the Claude application, matched exactly; interned
+# so comparisons against other interned names short-circuit on identity
+_CLAUDE_NAME = sys.intern('Claude')
+# The same name as raw /proc/<pid>/comm bytes; comm is cut to 15 bytes,
+# which can split a multibyte character, so it is never decoded
+_CLAUDE_COMM = _CLAUDE_NAME.encode()
+
+# Static listings, built once instead of on every list request
+_RESOURCES = [
+    types.Resource(
+        uri=types.AnyUrl("claude://status"),
+        name="Claude Status",
+        description="Current status of the Claude application",
+        mimeType="application/json",
+    )
+]
+
+_TOOLS = [
+    types.Tool(
+        name="restart_claude",
+        description="Restart the Claude application",
+        inputSchema={
+            "type": "object",
+            "properties": {},
+            "required": []
+        }
+    )
+]
+
+# Last known PID of the Claude process, validated before reuse; while the
+# status cache below is fresh it is the pid that status reported
+_claude_pid_cache: Optional[int] = None
+
+# Serialized claude://status response, reused for _STATUS_TTL seconds
+_STATUS_TTL = 1.0
+_status_cache: Optional[str] = None
+_status_cache_ts: float = 0.0
+# Bumped on every invalidation so scans that overlap a restart are not cached
+_cache_generation: int = 0
+
+# claude://status has a fixed shape whose values never need escaping
+# (bool, int or null, ISO timestamp), so fill a template instead of
+# calling json.dumps; the output matches json.dumps(status)
+_STATUS_TMPL = '{"running": %s, "pid": %s, "timestamp": "%s"}'
+
+# Seconds to wait for terminated Claude processes to exit
+_TERMINATE_TIMEOUT = 5
+
+# Whether restarts without a known pid terminate Claude with pkill
+_USE_PKILL = sys.platform == 'darwin'
+
+def _status_cache_fresh() -> bool:
+    """Check whether the cached status and the pid it saw are within the TTL."""
+    return _status_cache is not None and time.monotonic() - _status_cache_ts < _STATUS_TTL
+
+def _is_claude_pid(pid: int) -> bool:
+    """Check whether pid still belongs to a Claude process."""
+    import psutil
+
+    try:
+        proc = psutil.Process(pid)
+        # Fetch name and status with one set of underlying syscalls
+        with proc.oneshot():
+            return proc.name() == _CLAUDE_NAME and proc.status() != psutil.STATUS_ZOMBIE
+    except (psutil.NoSuchProcess, psutil.AccessDenied):
+        return False
+
+def _locate_claude_pid(cached_pid: Optional[int]) -> Optional[int]:
+    """Return the pid of a running Claude process, trying cached_pid first."""
+    if cached_pid is not None and _is_claude_pid(cached_pid):
+        logger.debug(f"Cached Claude pid still valid: {cached_pid}")
+        return cached_pid
+    for pid in _find_claude_pids():
+        # Only consider it a valid process if it has a pid
+        if pid is not None and pid > 0:
+            logger.debug(f"Valid Claude process found with pid: {pid}")
+            return pid
+    return None
+
+def _invalidate_process_caches() -> None:
+    """Drop the cached Claude pid and status after Claude has been restarted."""
+    global _claude_pid_cache, _status_cache, _cache_generation
+    _claude_pid_cache = None
+    _status_cache = None
+    _cache_generation += 1
+
+def _find_child_claude_pids() -> list[int]:
+    """Return the pids of Claude processes descended from this server."""
+    import psutil
+
+    pids = []
+    try:
+        children = psutil.Process().children(recursive=True)
+    except psutil.Error as e:
+        logger.debug(f"Error listing child processes: {e}")
+        return pids
+    for child in children:
+        try:
+            if child.name() == _CLAUDE_NAME:
+                pids.append(child.pid)
+        except (psutil.NoSuchProcess, psutil.AccessDenied):
+            continue
+    return pids
+
+def _discover_claude_pids() -> list[int]:
+    """Return the pids of Claude processes, checking our own subtree first."""
+    return _find_child_claude_pids() or _find_claude_pids()
+
+def _wait_for_exit(procs: list["psutil.Process"], timeout: float) -> tuple[list["psutil.Process"], list["psutil.Process"]]:
+    """Wait up to timeout seconds for procs to exit and return (gone, alive)."""
+    import psutil
+
+    if hasattr(os, 'pidfd_open'):
+        waiter = _wait_pidfds
+    elif hasattr(select, 'kqueue'):
+        waiter = _wait_kqueue
+    else:
+        return psutil.wait_procs(procs, timeout=timeout)
+
+    try:
+        gone, alive = waiter(procs, time.monotonic() + timeout)
+    except OSError as e:
+        logger.debug(f"Kernel process wait unavailable, polling instead: {e}")
+        return psutil.wait_procs(procs, timeout=timeout)
+
+    # Reap any of our own children so they do not linger as zombies
+    for proc in gone:
+        _reap_child(proc.pid)
+    return gone, alive
+
+def _wait_pidfds(procs: list["psutil.Process"], deadline: float) -> tuple[list["psutil.Process"], list["psutil.Process"]]:
+    """Wait for procs to exit by polling their pidfds until deadline."""
+    gone = []
+    pending = {}
+    poller = select.poll()
+    try:
+        for proc in procs:
+            try:
+                fd = os.pidfd_open(proc.pid)
+            except ProcessLookupError:
+                gone.append(proc)
+                continue
+            # The pid may have been reused before the fd was opened
+            if not proc.is_running():
+                os.close(fd)
+                gone.append(proc)
+                continue
+            pending[fd] = proc
+            poller.register(fd, select.POLLIN)
+
+        while pending:
+            remaining = deadline - time.monotonic()
+            if remaining <= 0:
+                break
+            for fd, _ in poller.poll(remaining * 1000):
+                poller.unregister(fd)
+                os.close(fd)
+                gone.append(pending.pop(fd))
+    finally:
+        for fd in pending:
+            os.close(fd)
+    return gone, list(pending.values())
+
+def _wait_kqueue(procs: list["psutil.Process"], deadline: float) -> tuple[list["psutil.Process"], list["psutil.Process"]]:
+    """Wait for procs to exit via kqueue NOTE_EXIT events until deadline."""
+    gone = []
+    pending = {}
+    kq = select.kqueue()
+    try:
+        for proc in procs:
+            event = select.kevent(
+                proc.pid,
+                filter=select.KQ_FILTER_PROC,
+                flags=select.KQ_EV_ADD | select.KQ_EV_ONESHOT,
+                fflags=select.KQ_NOTE_EXIT,
+            )
+            try:
+                kq.control([event], 0)
+            except ProcessLookupError:
+                gone.append(proc)
+                continue
+            # The pid may have been reused before the event was added
+            if not proc.is_running():
+                gone.append(proc)
+                continue
+            pending[proc.pid] = proc
+
+        while pending:
+            remaining = deadline - time.monotonic()
+            if remaining <= 0:
+                break
+            for event in kq.control(None, len(pending), remaining):
+                proc = pending.pop(event.ident, None)
+                if proc is not None:
+                    gone.append(proc)
+    finally:
+        kq.close()
+    return gone, list(pending.values())
+
+def _iso_timestamp() -> str:
+    """Return the local time in ISO 8601 format without building a datetime."""
+    now = time.time()
+    return time.strftime("%Y-%m-%dT%H:%M:%S", time.localtime(now)) + f".{int(now * 1e6) % 1_000_000:06d}"
+
+def _find_claude_pids() -> list[int]:
+    """Return the pids of all running Claude processes."""
+    import psutil
+
+    logger.debug("Searching for Claude processes...")
+    if sys.platform.startswith('linux'):
+        pids = []
+        for pid in psutil.pids():
+            try:
+                with open(f"/proc/{pid}/comm", 'rb') as f:
+                    if f.readline().rstrip(b'\n') == _CLAUDE_COMM:
+                        pids.append(pid)
+            except OSError:
+                continue
+        return pids
+
+    if sys.platform == 'darwin':
+        try:
+            completed = _run_off_stdio(
+                ['pgrep', '-x', _CLAUDE_NAME],
+                stdout=subprocess.PIPE,
+                stderr=subprocess.PIPE,
+                text=True,
+            )
+            # pgrep exits with 1 when no process matched
+            if completed.returncode in (0, 1):
+                return [int(pid) for pid in completed.stdout.split()]
+            logger.debug(f"pgrep failed with exit code {completed.returncode}")
+        except (OSError, ValueError) as e:
+            logger.debug(f"pgrep failed: {e}")
+
+    pids = []
+    for proc in psutil.process_iter(['name']):
+        try:
+            if proc.info['name'] == _CLAUDE_NAME:
+                pids.append(proc.pid)
+        except (psutil.NoSuchProcess, psutil.AccessDenied, KeyError):
+            continue
+    return pids
+
+def _pkill_claude(timeout: float) -> bool:
+    """Terminate Claude with pkill and wait; return whether anything matched."""
+    deadline = time.monotonic() + timeout
+    completed = _run_off_stdio(['pkill', '-TERM', '-x', _CLAUDE_NAME], timeout=timeout)
+    # pkill exits with 1 when no process matched
+    if completed.returncode == 1:
+        return False
+    if completed.returncode != 0:
+        raise RuntimeError(f"pkill failed with exit code {completed.returncode}")
+
+    # Each check forks pgrep, so back off between them
+    delay = 0.05
+    while _find_claude_pids():
+        remaining = deadline - time.monotonic()
+        if remaining <= 0:
+            raise TimeoutError(f"Claude still running after {timeout}s")
+        time.sleep(min(delay, remaining))
+        delay = min(delay * 2, 0.5)
+    return True
+
+# stdin and stdout carry the MCP stdio transport, so every child process
+# gets /dev/null for both instead
+_SPAWN_FILE_ACTIONS = [(os.POSIX_SPAWN_OPEN, fd, os.devnull, os.O_RDWR, 0) for fd in (0, 1)]
+
+def _run_off_stdio(args: list[str], **kwargs: Any) -> subprocess.CompletedProcess:
+    """Run a helper command with stdin and stdout off the stdio transport."""
+    kwargs.setdefault('stdout', subprocess.DEVNULL)
+    return subprocess.run(args, stdin=subprocess.DEVNULL, **kwargs)
+
+def _launch_claude() -> int:
+    """Launch Claude via `open` and return the launcher's pid."""
+    pid = os.posix_spawnp('open', ['open', '-a', 'Claude'], os.environ, file_actions=_SPAWN_FILE_ACTIONS)
+    # `open` exits once Claude is launched; reap it off the event loop
+    asyncio.get_running_loop().run_in_executor(None, _reap_child, pid)
+    return pid
+
+def _reap_child(pid: int) -> None:
+    """Wait for a spawned child so it does not linger as a zombie."""
+    try:
+        os.waitpid(pid, 0)
+    except ChildProcessError:
+        pass
+
 @server.list_resources()
 async def handle_list_resources() -> list[types.Resource]:
     """List available resources."""
-    return [
-        types.Resource(
-            uri=types.AnyUrl("claude://status"),
-            name="Claude Status",
-            description="Current status of the Claude application",
-            mimeType="application/json",
-        )
-    ]
+    return _RESOURCES
 
 @server.read_resource()
 async def handle_read_resource(uri: types.AnyUrl) -> str:
     """Read Claude status."""
+    global _claude_pid_cache, _status_cache, _status_cache_ts
+
     logger.debug(f"Handling read_resource request for URI: {uri}")
     if uri.scheme != "claude":
         logger.error(f"Unsupported URI scheme: {uri.scheme}")
@@ -48,55 +334,38 @@ async def handle_read_resource(uri: types.AnyUrl) -> str:
         logger.error(f"Unknown resource path: {path}")
         raise ValueError(f"Unknown resource path: {path}")
 
-    # Find Claude process
-    claude_process = None
-    logger.debug("Searching for Claude process...")
-    for proc in psutil.process_iter(['pid', 'name']):
-        try:
-            # Handle both dictionary and attribute access for process info
-            name = proc.info['name'] if isinstance(proc.info, dict) else proc.info.name
-            pid = proc.info['pid'] if isinstance(proc.info, dict) else proc.info.pid
-            logger.debug(f"Found process: name={name}, pid={pid}")
-            
-            if name == 'Claude':
-                logger.debug(f"Found Claude process with pid: {pid}")
-                # Only consider it a valid process if it has a pid
-                if pid is not None and pid > 0:
-                    claude_process = proc
-                    logger.debug(f"Valid Claude process found with pid: {pid}")
-                    break
-                else:
-                    logger.debug("Claude process found but has invalid pid")
-        except (psutil.NoSuchProcess, psutil.AccessDenied, KeyError, AttributeError) as e:
-            logger.debug(f"Error accessing process: {e}")
-            continue
+    if _status_cache_fresh():
+        logger.debug("Returning cached status")
+        return _status_cache
+
+    # Scan off the event loop; if a restart invalidates the caches while
+    # the scan runs, its result is returned but not cached
+    generation = _cache_generation
+    claude_pid = await asyncio.to_thread(_locate_claude_pid, _claude_pid_cache)
+    cache_result = generation == _cache_generation
+    if cache_result:
+        _claude_pid_cache = claude_pid
 
-    is_running = claude_process is not None
-    logger.debug(f"Final status - is_running: {is_running}, process: {claude_process}")
+    is_running = claude_pid is not None
+    logger.debug(f"Final status - is_running: {is_running}, pid: {claude_pid}")
     
-    status = {
-        "running": is_running,
-        "pid": claude_process.pid if is_running else None,
-        "timestamp": datetime.now().isoformat()
-    }
+    status = _STATUS_TMPL % (
+        "true" if is_running else "false",
+        claude_pid if is_running else "null",
+        _iso_timestamp(),
+    )
     logger.debug(f"Returning status: {status}")
 
-    return json.dumps(status)
+    # Stamp after the scan so a slow scan does not shorten the TTL window
+    if cache_result:
+        _status_cache = status
+        _status_cache_ts = time.monotonic()
+    return status
 
 @server.list_tools()
 async def handle_list_tools() -> list[types.Tool]:
     """List available tools."""
-    return [
-        types.Tool(
-            name="restart_claude",
-            description="Restart the Claude application",
-            inputSchema={
-                "type": "object",
-                "properties": {},
-                "required": []
-            }
-        )
-    ]
+    return _TOOLS
 
 @server.call_tool()
 async def handle_call_tool(name: str, arguments: Any) -> list[types.TextContent | types.ImageContent | types.EmbeddedResource]:
@@ -104,49 +373,108 @@ async def handle_call_tool(name: str, arguments: Any) -> list[types.TextContent
     if name != "restart_claude":
         raise ValueError(f"Unknown tool: {name}")
 
+    import orjson
+
+    # Resolve the request context once rather than on every use; direct
+    # calls made outside a request have no context and no progress token
+    try:
+        ctx = server.request_context
+    except LookupError:
+        ctx = None
+    meta = ctx.meta if ctx is not None else None
+    progress_token = meta.progressToken if meta is not None else None
+
+    try:
+        result = await _restart_claude()
+    finally:
+        # Status reads that ran during the restart must not outlive it
+        _invalidate_process_caches()
+
+    # Clients only act on completion, so report just the final step
+    if progress_token is not None:
+        await ctx.session.send_progress_notification(progress_token, 2, 2)
+
+    return [types.TextContent(type="text", text=orjson.dumps(result, option=orjson.OPT_INDENT_2).decode())]
+
+async def _restart_claude() -> dict[str, Any]:
+    """Terminate any running Claude processes and launch a new one."""
+    import psutil
+
+    # Prefer the last known Claude pid over a full process scan. A status
+    # read within the TTL has just scanned, so a "not running" result is
+    # trusted as-is; a pid it reported is still checked to be Claude.
+    cached_pid = _claude_pid_cache
+    snapshot_fresh = _status_cache_fresh()
+
+    # Any cached pid is about to be terminated; the relaunched Claude is
+    # started by `open`, so its pid is only known after the next scan.
+    # Dropping the cached status makes the next read reflect the restart.
+    _invalidate_process_caches()
+
     result = {"status": "success", "message": ""}
 
-    # Find and terminate existing Claude processes
+    # Find and terminate existing Claude processes, off the event loop
+    if snapshot_fresh and cached_pid is None:
+        logger.debug("Status snapshot reports Claude not running")
+        pids = []
+    elif cached_pid is not None and await asyncio.to_thread(_is_claude_pid, cached_pid):
+        logger.debug(f"Using cached Claude pid: {cached_pid}")
+        pids = [cached_pid]
+    elif _USE_PKILL:
+        # Let pkill match and signal everything in one pass instead of
+        # building a psutil.Process per match
+        pids = []
+        try:
+            if await asyncio.to_thread(_pkill_claude, _TERMINATE_TIMEOUT):
+                result["message"] += "Terminated existing Claude process(es). "
+        except (TimeoutError, subprocess.TimeoutExpired):
+            result["status"] = "error"
+            result["message"] = "Failed to terminate Claude: timeout"
+            return result
+        except Exception as e:
+            result["status"] = "error"
+            result["message"] = f"Failed to terminate Claude: {str(e)}"
+            return result
+    else:
+        pids = await asyncio.to_thread(_discover_claude_pids)
+
     claude_processes = []
-    for proc in psutil.process_iter(['pid', 'name']):
+    for pid in pids:
         try:
-            if proc.info['name'] == 'Claude':
-                claude_processes.append(proc)
+            claude_processes.append(psutil.Process(pid))
         except (psutil.NoSuchProcess, psutil.AccessDenied):
             continue
 
-    # Terminate existing processes
+    # Terminate existing processes: signal them all first, then wait for
+    # them together so the timeout applies once rather than per process
     if claude_processes:
         try:
             for proc in claude_processes:
-                try:
-                    proc.terminate()
-                    proc.wait(timeout=5)
-                    result["message"] += f"Terminated Claude process {proc.pid}. "
-                except psutil.TimeoutExpired:
-                    result["status"] = "error"
-                    result["message"] = "Failed to terminate Claude: timeout"
-                    return [types.TextContent(type="text", text=json.dumps(result, indent=2))]
-                except Exception as e:
-                    result["status"] = "error"
-                    result["message"] = f"Failed to terminate Claude: {str(e)}"
-                    return [types.TextContent(type="text", text=json.dumps(result, indent=2))]
-
-            result["message"] += f"Terminated {len(claude_processes)} existing Claude process(es). "
+                proc.terminate()
+            gone, alive = await asyncio.to_thread(_wait_for_exit, claude_processes, _TERMINATE_TIMEOUT)
         except Exception as e:
             result["status"] = "error"
             result["message"] = f"Failed to terminate Claude: {str(e)}"
-            return [types.TextContent(type="text", text=json.dumps(result, indent=2))]
+            return result
+
+        if alive:
+            result["status"] = "error"
+            result["message"] = "Failed to terminate Claude: timeout"
+            return result
+
+        for proc in gone:
+            result["message"] += f"Terminated Claude process {proc.pid}. "
+        result["message"] += f"Terminated {len(claude_processes)} existing Claude process(es). "
 
     # Start new Claude process
     try:
-        subprocess.Popen(['open', '-a', 'Claude'])
+        result["pid"] = _launch_claude()
         result["message"] += "Started new Claude process."
     except Exception as e:
         result["status"] = "error"
         result["message"] = "Failed to start Claude"
 
-    return [types.TextContent(type="text", text=json.dumps(result, indent=2))]
+    return result
 
 async def main():
     """Main entry point for the server."""
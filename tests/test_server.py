@@ -3,18 +3,22 @@ import json
 import pytest
 import psutil
 import subprocess
-from unittest.mock import MagicMock, AsyncMock, patch
+from unittest.mock import MagicMock, AsyncMock, PropertyMock, patch
 import sys
 import os
 from pydantic import AnyUrl
 from datetime import datetime
 import contextvars
+import contextlib
+import io
+import time
 
 # Add the project root to the Python path
 sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
 
 # Import from the new package structure
 from src.mcp_server_restart.server import handle_call_tool, handle_list_tools, handle_list_resources, handle_read_resource, server
+import src.mcp_server_restart.server as server_module
 from mcp.server import request_ctx
 import mcp.types as types
 
@@ -35,6 +39,22 @@ class MockProcess:
             raise psutil.TimeoutExpired(self.pid, timeout or 5)
         pass
 
+    def is_running(self):
+        """Mimic psutil process is_running method"""
+        return not self.terminated
+
+    def name(self):
+        """Mimic psutil process name method"""
+        return self.info['name']
+
+    def status(self):
+        """Mimic psutil process status method"""
+        return psutil.STATUS_RUNNING
+
+    def oneshot(self):
+        """Mimic psutil process oneshot context manager"""
+        return contextlib.nullcontext()
+
     def as_dict(self, attrs=None):
         """Mimic psutil process as_dict method"""
         return self.info
@@ -43,6 +63,29 @@ class MockProcess:
         """Helper to simulate wait timeout"""
         self._wait_timeout = timeout
 
+@contextlib.contextmanager
+def patch_processes(process_iter):
+    """Expose the Claude processes returned by process_iter to the server."""
+    processes = {}
+    def find_claude_pids():
+        processes.clear()
+        processes.update((p.pid, p) for p in process_iter() if p.info['name'] == 'Claude')
+        return list(processes)
+
+    def process(pid=None):
+        if pid is None:
+            # The server's own process, with no Claude descendants
+            self_process = MagicMock()
+            self_process.children.return_value = []
+            return self_process
+        if pid not in processes:
+            raise psutil.NoSuchProcess(pid)
+        return processes[pid]
+
+    with patch.object(server_module, '_find_claude_pids', side_effect=find_claude_pids), \
+         patch('psutil.Process', side_effect=process):
+        yield
+
 class MockRequestContext:
     def __init__(self, progress_token=None):
         self.meta = MagicMock()
@@ -50,6 +93,31 @@ class MockRequestContext:
         self.session = AsyncMock()
         self.session.send_progress_notification = AsyncMock()
 
+# Kept for the tests below that exercise the kernel wait on real processes
+real_wait_for_exit = server_module._wait_for_exit
+
+@pytest.fixture(autouse=True)
+def wait_with_psutil():
+    """Wait on mock processes through their mocked psutil wait methods."""
+    with patch.object(server_module, '_wait_for_exit',
+                      side_effect=lambda procs, timeout: psutil.wait_procs(procs, timeout=timeout)):
+        yield
+
+@pytest.fixture(autouse=True)
+def scan_instead_of_pkill():
+    """Keep restarts on the scan path so tests never run a real pkill."""
+    with patch.object(server_module, '_USE_PKILL', False):
+        yield
+
+@pytest.fixture(autouse=True)
+def reset_process_caches():
+    """Reset module-level process caches between tests."""
+    server_module._claude_pid_cache = None
+    server_module._status_cache = None
+    yield
+    server_module._claude_pid_cache = None
+    server_module._status_cache = None
+
 @pytest.mark.asyncio
 async def test_list_tools():
     """Test that list_tools returns the expected tool."""
@@ -74,8 +142,8 @@ async def test_restart_claude_success():
     def mock_process_iter(*args, **kwargs):
         return [mock_process]
     
-    with patch('psutil.process_iter', mock_process_iter), \
-         patch('subprocess.Popen') as mock_popen:
+    with patch_processes(mock_process_iter), \
+         patch('os.posix_spawnp', return_value=4321) as mock_spawn:
         
         result = await handle_call_tool("restart_claude", {})
         result_data = json.loads(result[0].text)
@@ -91,15 +159,17 @@ async def test_restart_claude_no_existing_process():
     def mock_process_iter(*args, **kwargs):
         return []
     
-    with patch('psutil.process_iter', mock_process_iter), \
-         patch('subprocess.Popen') as mock_popen:
+    with patch_processes(mock_process_iter), \
+         patch('os.posix_spawnp', return_value=4321) as mock_spawn:
         
         result = await handle_call_tool("restart_claude", {})
         result_data = json.loads(result[0].text)
         
         assert result_data["status"] == "success"
         assert "Started new Claude process" in result_data["message"]
-        assert mock_popen.called
+        assert mock_spawn.called
+        assert mock_spawn.call_args[0][:2] == ('open', ['open', '-a', 'Claude'])
+        assert result_data["pid"] == 4321
 
 @pytest.mark.asyncio
 async def test_restart_claude_termination_error():
@@ -112,15 +182,15 @@ async def test_restart_claude_termination_error():
         raise Exception("Termination failed")
     mock_process.terminate = mock_terminate
     
-    with patch('psutil.process_iter', mock_process_iter), \
-         patch('subprocess.Popen') as mock_popen:
+    with patch_processes(mock_process_iter), \
+         patch('os.posix_spawnp', return_value=4321) as mock_spawn:
         
         result = await handle_call_tool("restart_claude", {})
         result_data = json.loads(result[0].text)
         
         assert result_data["status"] == "error"
         assert "Failed to terminate Claude" in result_data["message"]
-        assert not mock_popen.called
+        assert not mock_spawn.called
 
 @pytest.mark.asyncio
 async def test_restart_claude_start_error():
@@ -129,11 +199,11 @@ async def test_restart_claude_start_error():
     def mock_process_iter(*args, **kwargs):
         return [mock_process]
     
-    def mock_popen(*args, **kwargs):
+    def mock_spawn(*args, **kwargs):
         raise Exception("Failed to start process")
     
-    with patch('psutil.process_iter', mock_process_iter), \
-         patch('subprocess.Popen', side_effect=mock_popen):
+    with patch_processes(mock_process_iter), \
+         patch('os.posix_spawnp', side_effect=mock_spawn):
         
         result = await handle_call_tool("restart_claude", {})
         result_data = json.loads(result[0].text)
@@ -149,7 +219,7 @@ async def test_status_resource_response():
     def mock_process_iter(*args, **kwargs):
         return [mock_process]
     
-    with patch('psutil.process_iter', mock_process_iter):
+    with patch_processes(mock_process_iter):
         result = await handle_read_resource(types.AnyUrl("claude://status"))
         data = json.loads(result)
         
@@ -159,6 +229,8 @@ async def test_status_resource_response():
         assert "timestamp" in data
         assert data["running"] is True
         assert data["pid"] == 54321
+        # The templated response matches what json.dumps would produce
+        assert result == json.dumps(data)
         # Validate timestamp format
         try:
             datetime.strptime(data["timestamp"], "%Y-%m-%dT%H:%M:%S.%f")
@@ -166,15 +238,17 @@ async def test_status_resource_response():
             datetime.strptime(data["timestamp"], "%Y-%m-%dT%H:%M:%S")
     
     # Test with no process
+    server_module._status_cache = None
     def mock_empty_iter(*args, **kwargs):
         return []
     
-    with patch('psutil.process_iter', mock_empty_iter):
+    with patch_processes(mock_empty_iter):
         result = await handle_read_resource(types.AnyUrl("claude://status"))
         data = json.loads(result)
         
         assert data["running"] is False
         assert data["pid"] is None
+        assert result == json.dumps(data)
 
 @pytest.mark.asyncio
 async def test_multiple_claude_processes():
@@ -189,8 +263,8 @@ async def test_multiple_claude_processes():
     def mock_process_iter(*args, **kwargs):
         return processes
     
-    with patch('psutil.process_iter', mock_process_iter), \
-         patch('subprocess.Popen') as mock_popen:
+    with patch_processes(mock_process_iter), \
+         patch('os.posix_spawnp', return_value=4321) as mock_spawn:
         
         result = await handle_call_tool("restart_claude", {})
         result_data = json.loads(result[0].text)
@@ -200,7 +274,7 @@ async def test_multiple_claude_processes():
         assert result_data["status"] == "success"
         assert "Terminated 3 existing Claude process(es)" in result_data["message"]
         assert "Started new Claude process" in result_data["message"]
-        assert mock_popen.called
+        assert mock_spawn.called
 
 @pytest.mark.asyncio
 async def test_invalid_resource_uri():
@@ -227,7 +301,7 @@ async def test_status_consistency():
     def mock_process_iter(*args, **kwargs):
         return [mock_process]
     
-    with patch('psutil.process_iter', mock_process_iter):
+    with patch_processes(mock_process_iter):
         result = await handle_read_resource(types.AnyUrl("claude://status"))
         data = json.loads(result)
         assert data["running"] is True, "Process should be marked as running"
@@ -237,21 +311,23 @@ async def test_status_consistency():
         assert data["pid"] == mock_process.pid, "PID should match the mock process"
     
     # Test with no process
+    server_module._status_cache = None
     def mock_empty_iter(*args, **kwargs):
         return []
     
-    with patch('psutil.process_iter', mock_empty_iter):
+    with patch_processes(mock_empty_iter):
         result = await handle_read_resource(types.AnyUrl("claude://status"))
         data = json.loads(result)
         assert data["running"] is False, "Process should be marked as not running"
         assert data["pid"] is None, "Non-running process must have null pid"
     
     # Test the edge case we're seeing in production where running=true but pid=null
+    server_module._status_cache = None
     mock_process_no_pid = MockProcess('Claude', pid=None)
     def mock_process_iter_no_pid(*args, **kwargs):
         return [mock_process_no_pid]
     
-    with patch('psutil.process_iter', mock_process_iter_no_pid):
+    with patch_processes(mock_process_iter_no_pid):
         result = await handle_read_resource(types.AnyUrl("claude://status"))
         data = json.loads(result)
         # These assertions should fail if we have running=true with pid=null
@@ -260,6 +336,401 @@ async def test_status_consistency():
             assert isinstance(data["pid"], int), "Running process must have integer pid"
             assert data["pid"] > 0, "Running process must have positive pid"
 
+@pytest.mark.asyncio
+async def test_status_uses_cached_pid():
+    """Test that a still-valid cached pid skips the full process scan."""
+    server_module._claude_pid_cache = 4242
+    cached_process = MagicMock()
+    cached_process.name.return_value = 'Claude'
+
+    with patch('psutil.Process', return_value=cached_process) as mock_process_cls, \
+         patch.object(server_module, '_find_claude_pids') as mock_find:
+        result = await handle_read_resource(types.AnyUrl("claude://status"))
+        data = json.loads(result)
+
+        mock_process_cls.assert_called_once_with(4242)
+        assert not mock_find.called
+        assert data["running"] is True
+        assert data["pid"] == 4242
+
+    # A stale cached pid falls back to the scan and repopulates the cache
+    server_module._status_cache = None
+    cached_process.name.return_value = 'Other'
+    with patch('psutil.Process', return_value=cached_process), \
+         patch.object(server_module, '_find_claude_pids', return_value=[5151]):
+        result = await handle_read_resource(types.AnyUrl("claude://status"))
+        data = json.loads(result)
+
+        assert data["pid"] == 5151
+        assert server_module._claude_pid_cache == 5151
+
+@pytest.mark.asyncio
+async def test_status_ttl_cache():
+    """Test that status reads within the TTL reuse one scan until a restart."""
+    mock_process = MockProcess('Claude', pid=54321)
+    scans = []
+    def mock_process_iter(*args, **kwargs):
+        scans.append(1)
+        return [mock_process]
+
+    with patch_processes(mock_process_iter), \
+         patch('psutil.Process', side_effect=psutil.NoSuchProcess(54321)), \
+         patch('os.posix_spawnp', return_value=4321):
+        first = await handle_read_resource(types.AnyUrl("claude://status"))
+        second = await handle_read_resource(types.AnyUrl("claude://status"))
+        assert first == second
+        assert len(scans) == 1
+
+        # Restarting Claude invalidates the cached status
+        await handle_call_tool("restart_claude", {})
+        scans.clear()
+        await handle_read_resource(types.AnyUrl("claude://status"))
+        assert len(scans) == 1
+
+        # An expired entry triggers a fresh scan
+        server_module._status_cache_ts -= server_module._STATUS_TTL
+        scans.clear()
+        await handle_read_resource(types.AnyUrl("claude://status"))
+        assert len(scans) == 1
+
+@pytest.mark.asyncio
+async def test_restart_uses_cached_pid():
+    """Test that restart terminates a still-valid cached pid without scanning."""
+    mock_process = MockProcess('Claude', pid=4242)
+    server_module._claude_pid_cache = mock_process.pid
+
+    with patch('psutil.Process', return_value=mock_process), \
+         patch.object(server_module, '_find_claude_pids') as mock_find, \
+         patch('os.posix_spawnp', return_value=4321):
+        result = await handle_call_tool("restart_claude", {})
+        result_data = json.loads(result[0].text)
+
+        assert not mock_find.called
+        assert mock_process.terminated
+        assert result_data["status"] == "success"
+        assert "Terminated Claude process 4242" in result_data["message"]
+        assert server_module._claude_pid_cache is None
+
+    # A stale cached pid falls back to the full scan
+    server_module._claude_pid_cache = 4242
+    with patch('psutil.Process', side_effect=psutil.NoSuchProcess(4242)), \
+         patch.object(server_module, '_find_claude_pids', return_value=[]) as mock_find, \
+         patch('os.posix_spawnp', return_value=4321):
+        result = await handle_call_tool("restart_claude", {})
+        result_data = json.loads(result[0].text)
+
+        assert mock_find.called
+        assert result_data["status"] == "success"
+
+@pytest.mark.asyncio
+async def test_restart_reuses_fresh_status_snapshot():
+    """Test that restart right after a status read reuses that read's scan."""
+    mock_process = MockProcess('Claude', pid=54321)
+    scans = []
+    def mock_process_iter(*args, **kwargs):
+        scans.append(1)
+        return [mock_process]
+
+    with patch_processes(mock_process_iter), \
+         patch('os.posix_spawnp', return_value=4321):
+        await handle_read_resource(types.AnyUrl("claude://status"))
+        result = await handle_call_tool("restart_claude", {})
+        result_data = json.loads(result[0].text)
+
+        assert len(scans) == 1
+        assert mock_process.terminated
+        assert "Terminated Claude process 54321" in result_data["message"]
+        assert server_module._status_cache is None
+
+    # A fresh "not running" snapshot skips discovery entirely
+    def mock_empty_iter(*args, **kwargs):
+        scans.append(1)
+        return []
+
+    scans.clear()
+    with patch_processes(mock_empty_iter), \
+         patch('os.posix_spawnp', return_value=4321) as mock_spawn:
+        await handle_read_resource(types.AnyUrl("claude://status"))
+        result = await handle_call_tool("restart_claude", {})
+        result_data = json.loads(result[0].text)
+
+        assert len(scans) == 1
+        assert result_data["status"] == "success"
+        assert mock_spawn.called
+
+    # A snapshot pid that has since been reused by another process is
+    # spared, and a rescan finds Claude under its new pid
+    reused = MockProcess('Claude', pid=54321)
+    restarted = MockProcess('Claude', pid=54322)
+    running = [reused]
+    scans.clear()
+    with patch_processes(lambda: scans.append(1) or running), \
+         patch('os.posix_spawnp', return_value=4321):
+        await handle_read_resource(types.AnyUrl("claude://status"))
+        reused.info['name'] = 'Other'
+        running.append(restarted)
+        result = await handle_call_tool("restart_claude", {})
+        result_data = json.loads(result[0].text)
+
+        assert len(scans) == 2
+        assert not reused.terminated
+        assert restarted.terminated
+        assert result_data["status"] == "success"
+        assert "Terminated Claude process 54322" in result_data["message"]
+
+@pytest.mark.asyncio
+async def test_restart_prefers_child_claude_processes():
+    """Test that a Claude among our descendants is found without a full scan."""
+    child = MockProcess('Claude', pid=7777)
+    helper = MockProcess('Claude Helper', pid=7778)
+    self_process = MagicMock()
+    self_process.children.return_value = [helper, child]
+
+    def process(pid=None):
+        return self_process if pid is None else child
+
+    with patch('psutil.Process', side_effect=process), \
+         patch.object(server_module, '_find_claude_pids') as mock_find, \
+         patch('os.posix_spawnp', return_value=4321):
+        result = await handle_call_tool("restart_claude", {})
+        result_data = json.loads(result[0].text)
+
+        self_process.children.assert_called_once_with(recursive=True)
+        assert not mock_find.called
+        assert child.terminated
+        assert not helper.terminated
+        assert "Terminated Claude process 7777" in result_data["message"]
+
+@pytest.mark.asyncio
+async def test_restart_progress_notifications():
+    """Test that only a final progress notification is sent, and only with a token."""
+    for progress_token in ("restart-token", None):
+        context = MockRequestContext(progress_token)
+        ctx_token = request_ctx.set(context)
+        try:
+            with patch_processes(lambda: []), \
+                 patch('os.posix_spawnp', return_value=4321):
+                await handle_call_tool("restart_claude", {})
+        finally:
+            request_ctx.reset(ctx_token)
+
+        if progress_token is None:
+            context.session.send_progress_notification.assert_not_called()
+        else:
+            context.session.send_progress_notification.assert_awaited_once_with(progress_token, 2, 2)
+
+    # The request context is resolved once per call
+    context = MockRequestContext("restart-token")
+    with patch.object(type(server), 'request_context', new_callable=PropertyMock, return_value=context) as request_context, \
+         patch_processes(lambda: []), \
+         patch('os.posix_spawnp', return_value=4321):
+        await handle_call_tool("restart_claude", {})
+
+    assert request_context.call_count == 1
+    context.session.send_progress_notification.assert_awaited_once()
+
+@pytest.mark.asyncio
+async def test_restart_macos_uses_pkill():
+    """Test that macOS restarts terminate Claude with a single pkill."""
+    killed = subprocess.CompletedProcess(['pkill'], 0)
+    with patch.object(server_module, '_USE_PKILL', True), \
+         patch('subprocess.run', return_value=killed) as mock_run, \
+         patch.object(server_module, '_find_claude_pids', side_effect=[[123], []]) as mock_find, \
+         patch('psutil.Process') as mock_process_cls, \
+         patch('os.posix_spawnp', return_value=4321) as mock_spawn:
+        result = await handle_call_tool("restart_claude", {})
+        result_data = json.loads(result[0].text)
+
+        assert mock_run.call_args[0][0] == ['pkill', '-TERM', '-x', 'Claude']
+        assert mock_run.call_args[1]['stdin'] == subprocess.DEVNULL
+        assert mock_run.call_args[1]['stdout'] == subprocess.DEVNULL
+        assert mock_find.call_count == 2
+        assert not mock_process_cls.called
+        assert result_data["status"] == "success"
+        assert "Terminated existing Claude process(es)" in result_data["message"]
+        assert mock_spawn.called
+
+    # No matching process is not an error
+    none_found = subprocess.CompletedProcess(['pkill'], 1)
+    with patch.object(server_module, '_USE_PKILL', True), \
+         patch('subprocess.run', return_value=none_found), \
+         patch.object(server_module, '_find_claude_pids') as mock_find, \
+         patch('os.posix_spawnp', return_value=4321):
+        result = await handle_call_tool("restart_claude", {})
+        result_data = json.loads(result[0].text)
+
+        assert not mock_find.called
+        assert result_data["status"] == "success"
+        assert "Terminated" not in result_data["message"]
+
+    # Claude outliving the timeout is reported and not relaunched
+    with patch.object(server_module, '_USE_PKILL', True), \
+         patch('subprocess.run', return_value=killed), \
+         patch.object(server_module, '_find_claude_pids', return_value=[123]), \
+         patch.object(server_module, '_TERMINATE_TIMEOUT', 0.1), \
+         patch('os.posix_spawnp', return_value=4321) as mock_spawn:
+        result = await handle_call_tool("restart_claude", {})
+        result_data = json.loads(result[0].text)
+
+        assert result_data["status"] == "error"
+        assert result_data["message"] == "Failed to terminate Claude: timeout"
+        assert not mock_spawn.called
+
+@pytest.mark.asyncio
+async def test_terminate_all_before_waiting():
+    """Test that every process is signalled before a single batched wait."""
+    processes = [MockProcess('Claude', pid=1000), MockProcess('Claude', pid=1001)]
+    def mock_process_iter(*args, **kwargs):
+        return processes
+
+    def mock_wait_procs(procs, timeout=None):
+        assert all(p.terminated for p in procs), "wait started before all processes were signalled"
+        return list(procs), []
+
+    with patch_processes(mock_process_iter), \
+         patch('psutil.wait_procs', side_effect=mock_wait_procs) as wait_procs, \
+         patch('os.posix_spawnp', return_value=4321):
+        result = await handle_call_tool("restart_claude", {})
+        result_data = json.loads(result[0].text)
+
+        wait_procs.assert_called_once()
+        assert result_data["status"] == "success"
+        assert "Terminated 2 existing Claude process(es)" in result_data["message"]
+
+    # Processes that outlive the shared timeout are reported as a timeout
+    stuck = MockProcess('Claude', pid=1002)
+    def mock_wait(timeout=None):
+        raise psutil.TimeoutExpired(stuck.pid, timeout)
+    stuck.wait = mock_wait
+
+    with patch_processes(lambda: [stuck]), \
+         patch.object(server_module, '_TERMINATE_TIMEOUT', 0.05), \
+         patch('os.posix_spawnp', return_value=4321) as mock_spawn:
+        result = await handle_call_tool("restart_claude", {})
+        result_data = json.loads(result[0].text)
+
+        assert result_data["status"] == "error"
+        assert "timeout" in result_data["message"]
+        assert not mock_spawn.called
+
+def test_pkill_claude_timeout_covers_pkill():
+    """Test that time spent in pkill itself counts against the timeout."""
+    def slow_pkill(*args, **kwargs):
+        time.sleep(0.1)
+        return subprocess.CompletedProcess(['pkill'], 0)
+
+    with patch('subprocess.run', side_effect=slow_pkill), \
+         patch.object(server_module, '_find_claude_pids', return_value=[123]) as mock_find:
+        with pytest.raises(TimeoutError):
+            server_module._pkill_claude(0.1)
+        assert mock_find.call_count == 1
+
+def test_wait_for_exit_real_processes():
+    """Test that the kernel-backed wait reports exited and surviving processes."""
+    exiting = subprocess.Popen(['sleep', '30'])
+    lingering = subprocess.Popen(['sleep', '30'])
+    try:
+        exiting_proc = psutil.Process(exiting.pid)
+        lingering_proc = psutil.Process(lingering.pid)
+        exiting_proc.terminate()
+
+        gone, alive = real_wait_for_exit([exiting_proc, lingering_proc], 0.5)
+
+        assert gone == [exiting_proc]
+        assert alive == [lingering_proc]
+        # The exited child was reaped rather than left as a zombie
+        assert not psutil.pid_exists(exiting.pid) or exiting_proc.status() != psutil.STATUS_ZOMBIE
+    finally:
+        lingering.kill()
+        lingering.wait()
+
+@pytest.mark.skipif(not hasattr(os, 'pidfd_open'), reason="requires pidfd_open")
+def test_wait_pidfds_reused_pid():
+    """Test that a pid reused by another process is counted as gone."""
+    # Our own pid stands in for an unrelated process that took over the pid
+    reused = MagicMock(pid=os.getpid())
+    reused.is_running.return_value = False
+
+    gone, alive = server_module._wait_pidfds([reused], time.monotonic() + 5)
+
+    assert gone == [reused]
+    assert alive == []
+
+def test_import_does_not_load_psutil():
+    """Test that starting the server does not pay for importing psutil or orjson."""
+    code = "import sys, src.mcp_server_restart.server; print('psutil' in sys.modules, 'orjson' in sys.modules)"
+    root = os.path.abspath(os.path.join(os.path.dirname(__file__), '..'))
+    completed = subprocess.run([sys.executable, '-c', code], cwd=root, capture_output=True, text=True, check=True)
+    assert completed.stdout.strip() == "False False"
+
+def test_find_claude_pids_linux():
+    """Test that Linux discovery matches /proc/<pid>/comm exactly."""
+    comm = {
+        "/proc/1/comm": b"systemd\n",
+        "/proc/2/comm": b"Claude\n",
+        "/proc/4/comm": b"Claude Helper\n",
+    }
+    def mock_open(path, *args, **kwargs):
+        if path not in comm:
+            raise FileNotFoundError(path)
+        return io.BytesIO(comm[path])
+
+    with patch('sys.platform', 'linux'), \
+         patch('psutil.pids', return_value=[1, 2, 3, 4]), \
+         patch('builtins.open', mock_open), \
+         patch('psutil.process_iter') as mock_process_iter:
+        assert server_module._find_claude_pids() == [2]
+        assert not mock_process_iter.called
+
+def test_find_claude_pids_linux_undecodable_comm():
+    """Test that a comm cut mid-character does not break Linux discovery."""
+    comm = {
+        "/proc/1/comm": b"abcdefghijklmn\xc3\n",
+        "/proc/2/comm": b"Claude\n",
+    }
+    def mock_open(path, mode='r', *args, **kwargs):
+        if path not in comm:
+            raise FileNotFoundError(path)
+        data = comm[path]
+        return io.BytesIO(data) if 'b' in mode else io.StringIO(data.decode())
+
+    with patch('sys.platform', 'linux'), \
+         patch('psutil.pids', return_value=[1, 2]), \
+         patch('builtins.open', mock_open):
+        assert server_module._find_claude_pids() == [2]
+
+def test_find_claude_pids_macos():
+    """Test that macOS discovery uses a single pgrep call."""
+    found = subprocess.CompletedProcess(['pgrep'], 0, stdout="101\n202\n")
+    with patch('sys.platform', 'darwin'), \
+         patch('subprocess.run', return_value=found) as mock_run, \
+         patch('psutil.process_iter') as mock_process_iter:
+        assert server_module._find_claude_pids() == [101, 202]
+        mock_run.assert_called_once()
+        assert mock_run.call_args[0][0] == ['pgrep', '-x', 'Claude']
+        assert mock_run.call_args[1]['stdin'] == subprocess.DEVNULL
+        assert not mock_process_iter.called
+
+    none_found = subprocess.CompletedProcess(['pgrep'], 1, stdout="")
+    with patch('sys.platform', 'darwin'), \
+         patch('subprocess.run', return_value=none_found):
+        assert server_module._find_claude_pids() == []
+
+@pytest.mark.asyncio
+async def test_status_scan_overlapping_restart_not_cached():
+    """Test that a status scan overlapping a restart is returned but not cached."""
+    def locate_during_restart(cached_pid):
+        # Simulate restart_claude finishing while the scan runs in its thread
+        server_module._invalidate_process_caches()
+        return 54321
+
+    with patch.object(server_module, '_locate_claude_pid', side_effect=locate_during_restart):
+        result = await handle_read_resource(types.AnyUrl("claude://status"))
+
+    assert json.loads(result)["pid"] == 54321
+    assert server_module._status_cache is None
+    assert server_module._claude_pid_cache is None
+
 @pytest.mark.asyncio
 async def test_process_wait_timeout():
     """Test handling of process termination timeout."""
@@ -270,15 +741,15 @@ async def test_process_wait_timeout():
     def mock_process_iter(*args, **kwargs):
         return [mock_process]
     
-    with patch('psutil.process_iter', mock_process_iter), \
-         patch('subprocess.Popen') as mock_popen:
+    with patch_processes(mock_process_iter), \
+         patch('os.posix_spawnp', return_value=4321) as mock_spawn:
         
         result = await handle_call_tool("restart_claude", {})
         result_data = json.loads(result[0].text)
         
         assert result_data["status"] == "error"
         assert "Failed to terminate Claude" in result_data["message"]
-        assert not mock_popen.called  # Should not try to start new process
+        assert not mock_spawn.called  # Should not try to start new process
 
 if __name__ == '__main__':
     pytest.main([__file__])